@@ -23,17 +23,26 @@ Specification
 -------------
 """
 
+import io
+import os
 import sys
 import pprint
 import re
 import signal
+import weakref
 from six import PY3
 
 DEFAULT_TIMEOUT = 2000  # 2sec timeout used as default for functions that take timeouts
 DEFAULT_RECORD = 20000  # 20sec record time
+# dump the parsed env and result dicts to stderr, set PYST_AGI_DEBUG to enable
+DEBUG = bool(os.environ.get('PYST_AGI_DEBUG'))
 
-re_code = re.compile(r'(^\d*)\s*(.*)')
-re_kv = re.compile(r'(?P<key>\w+)=(?P<value>[^\s]+)\s*(?:\((?P<data>.*)\))*')
+re_kv = re.compile(r'(?P<key>\w+)=(?P<value>\S+)\s*(?:\((?P<data>.*)\))?')
+
+# maps the result of digit/char returning commands to the character, '0'
+# means no digit was pressed
+_DIGIT_TABLE = dict((str(i), chr(i)) for i in range(256))
+_DIGIT_TABLE['0'] = ''
 
 
 class AGIException(Exception):
@@ -83,59 +92,92 @@ class AGIInvalidCommand(AGIError):
     pass
 
         
-class AGI:
+def _res_to_char(res, _lookup=_DIGIT_TABLE.get):
+    """Convert the result of a digit/char returning command to a char"""
+    c = _lookup(res)
+    if c is None:
+        raise AGIError('Unable to convert result to char: %s' % res)
+    return c
+
+
+class AGI(object):
     """
     This class encapsulates communication between Asterisk an a python script.
     It handles encoding commands to Asterisk and parsing responses from
     Asterisk.
     """
 
+    # SIGHUP is process wide, so the handler is installed once and flags
+    # every instance alive when the signal arrives
+    _sighup_installed = False
+    _instances = weakref.WeakSet()
+
     def __init__(self, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr):
         self.stdin = stdin
         self.stdout = stdout
         self.stderr = stderr
+        # commands are written as utf8 bytes, bypassing the text layer of
+        # stdout when it has a binary buffer underneath; anything else that
+        # is not known to be binary gets str
+        self._out, self._out_bytes = stdout, False
+        if PY3:
+            mode = getattr(stdout, 'mode', '')
+            if isinstance(stdout, (io.RawIOBase, io.BufferedIOBase)) or \
+                    (isinstance(mode, str) and 'b' in mode):
+                self._out_bytes = True
+            elif isinstance(stdout, io.TextIOBase) and \
+                    hasattr(stdout, 'buffer'):
+                self._out, self._out_bytes = stdout.buffer, True
         self._got_sighup = False
-        signal.signal(signal.SIGHUP, self._handle_sighup)  # handle SIGHUP
-        self.stderr.write('ARGS: ')
-        self.stderr.write(str(sys.argv))
-        self.stderr.write('\n')
+        AGI._instances.add(self)
+        if not AGI._sighup_installed:
+            try:
+                signal.signal(signal.SIGHUP, AGI._handle_sighup)  # handle SIGHUP
+                AGI._sighup_installed = True
+            except ValueError:
+                # not the main thread, e.g. a threaded FastAGI server, where
+                # hangups are seen on the socket instead
+                pass
+        self.stderr.write('ARGS: %s\n' % str(sys.argv))
         self.env = {}
         self._get_agi_env()
 
     def _get_agi_env(self):
+        lines = []
+        readline = self.stdin.readline
         while 1:
-            line = self.stdin.readline().strip()
+            line = readline().strip()
             if PY3:
                 if type(line) is bytes: line = line.decode('utf8')
-            self.stderr.write('ENV LINE: ')
-            self.stderr.write(line)
-            self.stderr.write('\n')
             if line == '':
                 #blank line signals end
                 break
-            key, data = line.split(':')[0], ':'.join(line.split(':')[1:])
+            lines.append(line)
+        for line in lines:
+            key, sep, data = line.partition(':')
             key = key.strip()
-            data = data.strip()
             if key != '':
-                self.env[key] = data
-        self.stderr.write('class AGI: self.env = ')
-        self.stderr.write(pprint.pformat(self.env))
-        self.stderr.write('\n')
+                self.env[key] = data.strip()
+        trace = ''.join(['ENV LINE: %s\n' % line for line in lines])
+        trace += 'ENV LINE: \n'
+        if DEBUG:
+            trace += 'class AGI: self.env = %s\n' % pprint.pformat(self.env)
+        self.stderr.write(trace)
 
     def _quote(self, string):
         """ provides double quotes to string, converts int/bool to string """
-        if isinstance(string, int):
-          string = str(string)
-        if isinstance(string, float):
-          string = str(string)
+        if isinstance(string, (int, float)):
+            string = str(string)
         if PY3:
-            return ''.join(['"', string, '"'])
+            return '"' + string + '"'
         else:
-            return ''.join(['"', string.encode('utf8', 'ignore'), '"'])
+            return '"' + string.encode('utf8', 'ignore') + '"'
 
-    def _handle_sighup(self, signum, frame):
+    @classmethod
+    def _handle_sighup(cls, signum, frame):
         """Handle the SIGHUP signal"""
-        self._got_sighup = True
+        for agi in list(cls._instances):
+            agi._got_sighup = True
 
     def test_hangup(self):
         """This function throws AGIHangup if we have recieved a SIGHUP"""
@@ -155,71 +197,137 @@ class AGI:
             else:
                 raise
 
+    def execute_many(self, commands):
+        """agi.execute_many([(command, arg, ...), ...]) --> [result, ...]
+        Sends all of the commands before reading their results, saving a
+        round trip per command.  Every pending result is read even when
+        one of them fails, so the stream stays in step, and then the first
+        error is raised.  Keep batches small: Asterisk blocks writing the
+        results if they are not read.
+        """
+        self.test_hangup()
+
+        error = None
+        sent = 0
+        try:
+            for command in commands:
+                self.send_command(*command)
+                sent += 1
+        except IOError as e:
+            error = e
+        results = []
+        for i in range(sent):
+            try:
+                results.append(self.get_result())
+            except (AGIException, IOError) as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            if isinstance(error, IOError) and error.errno == 32:
+                # Broken Pipe * let us go
+                raise AGISIGPIPEHangup("Received SIGPIPE")
+            raise error
+        return results
+
     def send_command(self, command, *args):
         """Send a command to Asterisk"""
-        command = command.strip()
-        command = '%s %s' % (command, ' '.join(map(str, args)))
-        command = command.strip()
-        if command[-1] != '\n':
-            command += '\n'
+        if args:
+            command = '%s %s' % (command, ' '.join([str(arg) for arg in args]))
+        command = command.strip() + '\n'
         self.stderr.write('    COMMAND: %s' % command)
-        self.stdout.write(command)
-        self.stdout.flush()
+        out = self._out
+        if out is not self.stdout:
+            # text already written to stdout has to go out first
+            self.stdout.flush()
+        if self._out_bytes:
+            out.write(command.encode('utf8'))
+        else:
+            out.write(command)
+        out.flush()
 
-    def get_result(self, stdin=sys.stdin):
+    def get_result(self, stdin=None):
         """Read the result of a command from Asterisk"""
+        if stdin is None:
+            stdin = self.stdin
         code = 0
-        result = {'result': ('', '')}
-        line = self.stdin.readline().strip()
+        line = stdin.readline().strip()
         if PY3:
             if type(line) is bytes: line = line.decode('utf8')
         self.stderr.write('    RESULT_LINE: %s\n' % line)
-        m = re_code.search(line)
-        if m:
-            code, response = m.groups()
-            code = int(code)
+        # split the leading status code from the rest of the line
+        i, n = 0, len(line)
+        while i < n and line[i].isdigit():
+            i += 1
+        if i:
+            code = int(line[:i])
+        response = line[i:].lstrip()
+
+        handler = self._result_handlers.get(code)
+        if handler is None:
+            raise AGIUnknownError(code, 'Unhandled code or undefined response')
+        return getattr(self, handler)(line, response, stdin)
 
-        if code == 200:
-            for key, value, data in re_kv.findall(response):
-                result[key] = (value, data)
+    def _result_ok(self, line, response, stdin):
+        """Parse the key=value (data) pairs of a 200 response"""
+        result = {'result': ('', '')}
+        for m in re_kv.finditer(response):
+            key, value, data = m.groups('')
+            result[key] = (value, data)
 
-                # If user hangs up... we get 'hangup' in the data
-                if data == 'hangup':
-                    raise AGIResultHangup("User hungup during execution")
+            # If user hangs up... we get 'hangup' in the data
+            if data == 'hangup':
+                raise AGIResultHangup("User hungup during execution")
 
-                if key == 'result' and value == '-1':
-                    raise AGIAppError("Error executing application, or hangup")
+            if key == 'result' and value == '-1':
+                raise AGIAppError("Error executing application, or hangup")
 
+        if DEBUG:
             self.stderr.write('    RESULT_DICT: %s\n' % pprint.pformat(result))
-            return result
-        elif code == 510:
-            raise AGIInvalidCommand(response)
-        elif code == 520:
-            usage = [line]
-            line = self.stdin.readline().strip()
+        return result
+
+    def _result_invalid(self, line, response, stdin):
+        """Handle a 510 response"""
+        raise AGIInvalidCommand(response)
+
+    def _result_usage(self, line, response, stdin):
+        """Collect the usage text of a 520 response"""
+        usage = [line]
+        readline = stdin.readline
+        while 1:
+            line = readline()
+            if not line:
+                # EOF before the end of the usage text
+                break
+            line = line.strip()
             if PY3:
                 if type(line) is bytes: line = line.decode('utf8')
-            while line[:3] != '520':
-                usage.append(line)
-                line = self.stdin.readline().strip()
-                if PY3:
-                    if type(line) is bytes: line = line.decode('utf8')
             usage.append(line)
-            usage = '%s\n' % '\n'.join(usage)
-            raise AGIUsageError(usage)
-        else:
-            raise AGIUnknownError(code, 'Unhandled code or undefined response')
+            if line[:3] == '520':
+                break
+        raise AGIUsageError('%s\n' % '\n'.join(usage))
+
+    # response code -> name of the handler method, looked up by get_result
+    # on the instance so subclasses can override the handlers
+    _result_handlers = {
+        200: '_result_ok',
+        510: '_result_invalid',
+        520: '_result_usage',
+    }
+
+    def _execute_result(self, command, *args):
+        """Execute a command and return the value of its result key"""
+        return self.execute(command, *args)['result'][0]
 
     def _process_digit_list(self, digits):
-        if type(digits) is list:
-            digits = ''.join(map(str, digits))
+        if isinstance(digits, (list, tuple)):
+            digits = ''.join([str(digit) for digit in digits])
         return self._quote(digits)
 
     def answer(self):
         """agi.answer() --> None
         Answer channel if not already in answer state.
         """
-        self.execute('ANSWER')['result'][0]
+        self.execute('ANSWER')
 
     def wait_for_digit(self, timeout=DEFAULT_TIMEOUT):
         """agi.wait_for_digit(timeout=DEFAULT_TIMEOUT) --> digit
@@ -227,14 +335,8 @@ class AGI:
         digit.  Returns digit dialed
         Throws AGIError on channel falure
         """
-        res = self.execute('WAIT FOR DIGIT', timeout)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except ValueError:
-                raise AGIError('Unable to convert result to digit: %s' % res)
+        res = self._execute_result('WAIT FOR DIGIT', timeout)
+        return _res_to_char(res)
 
     def send_text(self, text=''):
         """agi.send_text(text='') --> None
@@ -242,7 +344,7 @@ class AGI:
         transmission of text.
         Throws AGIError on error/hangup
         """
-        self.execute('SEND TEXT', self._quote(text))['result'][0]
+        self.execute('SEND TEXT', self._quote(text))
 
     def receive_char(self, timeout=DEFAULT_TIMEOUT):
         """agi.receive_char(timeout=DEFAULT_TIMEOUT) --> chr
@@ -250,22 +352,16 @@ class AGI:
         maximum time to wait for input in milliseconds, or 0 for infinite. Most channels
         do not support the reception of text.
         """
-        res = self.execute('RECEIVE CHAR', timeout)['result'][0]
+        res = self._execute_result('RECEIVE CHAR', timeout)
 
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        return _res_to_char(res)
 
     def tdd_mode(self, mode='off'):
         """agi.tdd_mode(mode='on'|'off') --> None
         Enable/Disable TDD transmission/reception on a channel.
         Throws AGIAppError if channel is not TDD-capable.
         """
-        res = self.execute('TDD MODE', mode)['result'][0]
+        res = self._execute_result('TDD MODE', mode)
         if res == '0':
             raise AGIAppError('Channel %s is not TDD-capable')
 
@@ -280,16 +376,9 @@ class AGI:
         extension must not be included in the filename.
         """
         escape_digits = self._process_digit_list(escape_digits)
-        response = self.execute(
+        res = self._execute_result(
             'STREAM FILE', filename, escape_digits, sample_offset)
-        res = response['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        return _res_to_char(res)
 
     def control_stream_file(self, filename, escape_digits='', skipms=3000, fwd='', rew='', pause=''):
         """
@@ -302,15 +391,8 @@ class AGI:
         extension must not be included in the filename.
         """
         escape_digits = self._process_digit_list(escape_digits)
-        response = self.execute('CONTROL STREAM FILE', self._quote(filename), escape_digits, self._quote(skipms), self._quote(fwd), self._quote(rew), self._quote(pause))
-        res = response['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('CONTROL STREAM FILE', self._quote(filename), escape_digits, self._quote(skipms), self._quote(fwd), self._quote(rew), self._quote(pause))
+        return _res_to_char(res)
 
     def send_image(self, filename):
         """agi.send_image(filename) --> None
@@ -318,7 +400,7 @@ class AGI:
         transmission of images.   Image names should not include extensions.
         Throws AGIError on channel failure
         """
-        res = self.execute('SEND IMAGE', filename)['result'][0]
+        res = self._execute_result('SEND IMAGE', filename)
         if res != '0':
             raise AGIAppError('Channel falure on channel %s' %
                               self.env.get('agi_channel', 'UNKNOWN'))
@@ -331,14 +413,8 @@ class AGI:
         """
         digits = self._process_digit_list(digits)
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('SAY DIGITS', digits, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('SAY DIGITS', digits, escape_digits)
+        return _res_to_char(res)
 
     def say_number(self, number, escape_digits=''):
         """agi.say_number(number, escape_digits='') --> digit
@@ -348,14 +424,8 @@ class AGI:
         """
         number = self._process_digit_list(number)
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('SAY NUMBER', number, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('SAY NUMBER', number, escape_digits)
+        return _res_to_char(res)
 
     def say_alpha(self, characters, escape_digits=''):
         """agi.say_alpha(string, escape_digits='') --> digit
@@ -365,14 +435,8 @@ class AGI:
         """
         characters = self._process_digit_list(characters)
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('SAY ALPHA', characters, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('SAY ALPHA', characters, escape_digits)
+        return _res_to_char(res)
 
     def say_phonetic(self, characters, escape_digits=''):
         """agi.say_phonetic(string, escape_digits='') --> digit
@@ -382,15 +446,9 @@ class AGI:
         """
         characters = self._process_digit_list(characters)
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute(
-            'SAY PHONETIC', characters, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result(
+            'SAY PHONETIC', characters, escape_digits)
+        return _res_to_char(res)
 
     def say_date(self, seconds, escape_digits=''):
         """agi.say_date(seconds, escape_digits='') --> digit
@@ -398,14 +456,8 @@ class AGI:
         pressed.  The date should be in seconds since the UNIX Epoch (Jan 1, 1970 00:00:00)
         """
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('SAY DATE', seconds, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('SAY DATE', seconds, escape_digits)
+        return _res_to_char(res)
 
     def say_time(self, seconds, escape_digits=''):
         """agi.say_time(seconds, escape_digits='') --> digit
@@ -413,14 +465,8 @@ class AGI:
         pressed.  The time should be in seconds since the UNIX Epoch (Jan 1, 1970 00:00:00)
         """
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('SAY TIME', seconds, escape_digits)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result('SAY TIME', seconds, escape_digits)
+        return _res_to_char(res)
 
     def say_datetime(self, seconds, escape_digits='', format='', zone=''):
         """agi.say_datetime(seconds, escape_digits='', format='', zone='') --> digit
@@ -431,15 +477,9 @@ class AGI:
         escape_digits = self._process_digit_list(escape_digits)
         if format:
             format = self._quote(format)
-        res = self.execute(
-            'SAY DATETIME', seconds, escape_digits, format, zone)['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+        res = self._execute_result(
+            'SAY DATETIME', seconds, escape_digits, format, zone)
+        return _res_to_char(res)
 
     def get_data(self, filename, timeout=DEFAULT_TIMEOUT, max_digits=255):
         """agi.get_data(filename, timeout=DEFAULT_TIMEOUT, max_digits=255) --> digits
@@ -460,19 +500,11 @@ class AGI:
         """
         escape_digits = self._process_digit_list(escape_digits)
         if timeout:
-            response = self.execute(
+            res = self._execute_result(
                 'GET OPTION', filename, escape_digits, timeout)
         else:
-            response = self.execute('GET OPTION', filename, escape_digits)
-
-        res = response['result'][0]
-        if res == '0':
-            return ''
-        else:
-            try:
-                return chr(int(res))
-            except:
-                raise AGIError('Unable to convert result to char: %s' % res)
+            res = self._execute_result('GET OPTION', filename, escape_digits)
+        return _res_to_char(res)
 
     def set_context(self, context):
         """agi.set_context(context)
@@ -496,7 +528,7 @@ class AGI:
         No error appears to be produced.  Does not set exten or context
         Use at your own risk.  Ensure that you specify a valid priority.
         """
-        self.execute('set priority', priority)
+        self.execute('SET PRIORITY', priority)
 
     def goto_on_exit(self, context='', extension='', priority=''):
         context = context or self.env['agi_context']
@@ -518,12 +550,9 @@ class AGI:
         's=' and is also optional.
         """
         escape_digits = self._process_digit_list(escape_digits)
-        res = self.execute('RECORD FILE', self._quote(filename), format,
-                           escape_digits, timeout, offset, beep, ('s=%s' % silence))['result'][0]
-        try:
-            return chr(int(res))
-        except:
-            raise AGIError('Unable to convert result to digit: %s' % res)
+        res = self._execute_result('RECORD FILE', self._quote(filename), format,
+                                   escape_digits, timeout, offset, beep, ('s=%s' % silence))
+        return _res_to_char(res)
 
     def set_autohangup(self, secs):
         """agi.set_autohangup(secs) --> None
@@ -546,8 +575,7 @@ class AGI:
         Returns whatever the application returns, or -2 on failure to find
         application
         """
-        result = self.execute('EXEC', application, self._quote(options))
-        res = result['result'][0]
+        res = self._execute_result('EXEC', application, self._quote(options))
         if res == '-2':
             raise AGIAppError('Unable to find application: %s' % application)
         return res
@@ -627,6 +655,14 @@ class AGI:
         """
         self.execute('VERBOSE', self._quote(message), level)
 
+    def verbose_lines(self, messages, level=1):
+        """agi.verbose_lines(messages, level=1) --> None
+        Sends each of <messages> like verbose(), writing all of them before
+        reading any of the results, see execute_many().
+        """
+        self.execute_many([('VERBOSE', self._quote(message), level)
+                           for message in messages])
+
     def database_get(self, family, key):
         """agi.database_get(family, key) --> str
         Retrieves an entry in the Asterisk database for a given family and key.
@@ -634,8 +670,6 @@ class AGI:
         is set and returns the variable in parenthesis
         example return code: 200 result=1 (testvariable)
         """
-        family = '"%s"' % family
-        key = '"%s"' % key
         result = self.execute(
             'DATABASE GET', self._quote(family), self._quote(key))
         res, value = result['result']
@@ -689,7 +723,7 @@ class AGI:
     def exec_command(self, command, *args):
         """Send an arbitrary asterisk command with args (even not AGI commands)"""
         # The arguments of the command should be prepared as comma delimited, that's the way the EXEC works
-        args = ','.join(map(str, args))
+        args = ','.join([str(arg) for arg in args])
         return self.execute('EXEC', command, args)
 
 
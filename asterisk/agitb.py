@@ -22,6 +22,8 @@ at the top of your script.  The optional arguments to enable() are:
   (used with the agi option)
 * logdir      - if set, tracebacks are written to files in this directory
 * context     - number of lines of source code to show for each stack frame
+* skip_prefixes - leave out frames from files under these directories, e.g.
+  agitb.STDLIB_PREFIXES to hide the standard library and installed packages
 
 By default, tracebacks are displayed but not saved, and the context is 5 lines.
 
@@ -42,10 +44,24 @@ Specification
 __author__ = 'Matthew Nicholson'
 __version__ = '0.1.0'
 
+import inspect
+import keyword
+import linecache
+import os
+import string
 import sys
+import sysconfig
+import tempfile
+import time
+import traceback
 
 __UNDEF__ = []                          # a special sentinel object
 
+# where the standard library and installed packages live, for skip_prefixes
+STDLIB_PREFIXES = tuple(set(
+    path for key, path in sysconfig.get_paths().items()
+    if key in ('stdlib', 'platstdlib', 'purelib', 'platlib')))
+
 
 def lookup(name, frame, locals):
     """Find the value for a given name in the given environment."""
@@ -64,15 +80,126 @@ def lookup(name, frame, locals):
     return None, __UNDEF__
 
 
+# character classes used by scanvars to pick identifiers out of source lines
+_ID_START = frozenset(string.ascii_letters + '_')
+_ID_CONT = frozenset(string.ascii_letters + string.digits + '_')
+_NUM_CONT = frozenset(string.ascii_letters + string.digits + '_.')
+_STR_PREFIXES = frozenset(['r', 'u', 'b', 'f', 'br', 'rb', 'fr', 'rf'])
+_KEYWORDS = frozenset(keyword.kwlist)
+_OPEN, _CLOSE = frozenset('([{'), frozenset(')]}')
+
+
+def _is_id_char(c, start=False):
+    """Check non-ASCII characters for identifier-ness (Python 3 only)"""
+    if c < '\x80' or not hasattr(c, 'isidentifier'):
+        return False
+    return (c if start else 'a' + c).isidentifier()
+
+
+def _tokens(reader):
+    """Yield (is_name, token) for one logical line of Python read from reader.
+
+    This is a small scanner that only distinguishes what scanvars needs:
+    names, '.', and everything else.  Strings, numbers and comments are
+    skipped over as single tokens."""
+    s, i, depth, started, start = reader(), 0, 0, False, None
+    while 1:
+        n = len(s)
+        if i >= n:
+            if not s:
+                return
+            # ran out of text inside a logical line
+            s, i = reader(), 0
+            continue
+        c = s[i]
+        if c in ' \t\f\r':
+            i += 1
+        elif c == '\n':
+            # blank and comment lines before the statement are skipped
+            if depth <= 0 and started:
+                return
+            s, i = reader(), 0
+        elif c == '\\' and s[i + 1:i + 2] in ('\n', '\r'):
+            # explicit line continuation
+            s, i = reader(), 0
+        elif c == '#':
+            j = s.find('\n', i)
+            i = n if j < 0 else j
+        elif c in _ID_START or _is_id_char(c, True):
+            j = i + 1
+            while j < n and (s[j] in _ID_CONT or _is_id_char(s[j])):
+                j += 1
+            token = s[i:j]
+            if j < n and s[j] in '\'"' and token.lower() in _STR_PREFIXES:
+                # string prefix, the quote is scanned next
+                start, i = i, j
+                continue
+            started = True
+            yield token not in _KEYWORDS, token
+            i = j
+        elif c in '\'"':
+            if start is None:
+                start = i
+            quote = s[i:i + 3]
+            if quote not in ('"""', "\'\'\'"):
+                quote = c
+            j = i + len(quote)
+            while 1:
+                if len(quote) == 3:
+                    j = s.find(quote, j)
+                    if j < 0:
+                        # triple quoted string spanning lines
+                        line = reader()
+                        if not line:
+                            return
+                        s, j = s + line, len(s)
+                        continue
+                else:
+                    # a single quoted string ends at the end of the line
+                    end = s.find('\n', j)
+                    if end < 0:
+                        end = len(s)
+                    j = s.find(quote, j, end)
+                    if j < 0:
+                        j = end
+                        break
+                # skip escaped quotes
+                k = j
+                while s[k - 1] == '\\':
+                    k -= 1
+                if (j - k) % 2 == 0:
+                    j += len(quote)
+                    break
+                j += 1
+            started = True
+            yield False, s[start:j]
+            i, start = j, None
+        elif c.isdigit() or (c == '.' and s[i + 1:i + 2].isdigit()):
+            j = i + 1
+            while j < n and s[j] in _NUM_CONT:
+                j += 1
+            started = True
+            yield False, s[i:j]
+            i = j
+        elif c == '.' and s[i:i + 3] == '...':
+            started = True
+            yield False, '...'
+            i += 3
+        else:
+            if c in _OPEN:
+                depth += 1
+            elif c in _CLOSE:
+                depth -= 1
+            started = True
+            yield False, c
+            i += 1
+
+
 def scanvars(reader, frame, locals):
     """Scan one logical line of Python and look up values of variables used."""
-    import tokenize
-    import keyword
     vars, lasttoken, parent, prefix, value = [], None, None, '', __UNDEF__
-    for ttype, token, start, end, line in tokenize.generate_tokens(reader):
-        if ttype == tokenize.NEWLINE:
-            break
-        if ttype == tokenize.NAME and token not in keyword.kwlist:
+    for is_name, token in _tokens(reader):
+        if is_name:
             if lasttoken == '.':
                 if parent is not __UNDEF__:
                     value = getattr(parent, token, __UNDEF__)
@@ -81,7 +208,7 @@ def scanvars(reader, frame, locals):
                 where, value = lookup(token, frame, locals)
                 vars.append((token, where, value))
         elif token == '.':
-            prefix += lasttoken + '.'
+            prefix += (lasttoken or '') + '.'
             parent = value
         else:
             parent, prefix = None, ''
@@ -89,143 +216,259 @@ def scanvars(reader, frame, locals):
     return vars
 
 
-def text(eparams, context=5):
-    """Return a plain text document describing a given traceback."""
-    import os
-    import types
-    import time
-    import traceback
-    import linecache
-    import inspect
-    import pydoc
+# how lookup()'s scope is shown in front of a variable name
+_WHERE_PREFIX = {'global': 'global ', 'builtin': 'builtin '}
+
+
+def _fast_repr(value, _limit=200):
+    """Return repr(value) cut to _limit characters, never raising"""
+    try:
+        s = repr(value)
+    except Exception:
+        return '<repr failed>'
+    if len(s) > _limit:
+        return s[:_limit] + '...'
+    return s
+
+
+def _format_args(code, locals, _repr):
+    """Format the arguments of a frame as name=value pairs.
+
+    Same output as inspect.formatargvalues, read straight off the code
+    object."""
+    nargs = code.co_argcount + getattr(code, 'co_kwonlyargcount', 0)
+    names = code.co_varnames
+    args = ['%s=%s' % (name, _repr(locals[name]))
+            for name in names[:nargs] if name in locals]
+    if code.co_flags & inspect.CO_VARARGS:
+        name = names[nargs]
+        nargs += 1
+        if name in locals:
+            args.append('*%s=%s' % (name, _repr(locals[name])))
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        name = names[nargs]
+        if name in locals:
+            args.append('**%s=%s' % (name, _repr(locals[name])))
+    return ', '.join(args)
+
+
+def _frame_records(etb, context, skip_prefixes):
+    """Like inspect.getinnerframes, without the frames under skip_prefixes.
+
+    The innermost frame is always kept, it is where the error happened."""
+    tbs = []
+    while etb is not None:
+        tbs.append(etb)
+        etb = etb.tb_next
+    records = []
+    for i, tb in enumerate(tbs, 1 - len(tbs)):
+        if skip_prefixes and i:
+            file = tb.tb_frame.f_code.co_filename
+            if os.path.abspath(file).startswith(skip_prefixes):
+                continue
+        records.append((tb.tb_frame,) +
+                       tuple(inspect.getframeinfo(tb, context)))
+    return records
+
 
+def text(eparams, context=5, repr=None, skip_prefixes=()):
+    """Return a plain text document describing a given traceback.
+
+    Values are shown with a plain truncated repr; pass repr=pydoc.text.repr
+    (or any other function) for a different representation.  Frames from
+    files under one of skip_prefixes (STDLIB_PREFIXES, say) are left out."""
+    return ''.join(_text_chunks(eparams, context, repr, skip_prefixes))
+
+
+def _text_chunks(eparams, context=5, repr=None, skip_prefixes=()):
+    """Generate the document of text() piece by piece, a frame at a time."""
     etype, evalue, etb = eparams
-    if isinstance(etype, types.ClassType):
+    if inspect.isclass(etype):
         etype = etype.__name__
     pyver = 'Python ' + sys.version.split()[0] + ': ' + sys.executable
     date = time.ctime(time.time())
-    head = "%s\n%s\n%s\n" % (str(etype), pyver, date) + '''
+    yield "%s\n%s\n%s\n" % (str(etype), pyver, date) + '''
 A problem occurred in a Python script.  Here is the sequence of
 function calls leading up to the error, in the order they occurred.
 '''
 
-    frames = []
-    records = inspect.getinnerframes(etb, context)
+    _repr = repr or _fast_repr
+    file_cache = {}     # source lines of the files seen in this traceback
+    skip_prefixes = tuple(os.path.join(os.path.abspath(prefix), '')
+                          for prefix in skip_prefixes)
+    records = _frame_records(etb, context, skip_prefixes)
     for frame, file, lnum, func, lines, index in records:
         file = file and os.path.abspath(file) or '?'
-        args, varargs, varkw, locals = inspect.getargvalues(frame)
+        locals = frame.f_locals
         call = ''
         if func != '?':
-            call = 'in ' + func + \
-                inspect.formatargvalues(args, varargs, varkw, locals,
-                                        formatvalue=lambda value: '=' + pydoc.text.repr(value))
+            call = 'in %s(%s)' % (func, _format_args(frame.f_code, locals,
+                                                     _repr))
 
-        highlight = {}
+        source = file_cache.get(file)
+        if source is None:
+            source = file_cache[file] = linecache.getlines(file)
 
         def reader(lnum=[lnum]):
-            highlight[lnum[0]] = 1
             try:
-                return linecache.getline(file, lnum[0])
+                if 1 <= lnum[0] <= len(source):
+                    return source[lnum[0] - 1]
+                return ''
             finally:
                 lnum[0] += 1
-        vars = scanvars(reader, frame, locals)
+        names = scanvars(reader, frame, locals)
 
-        rows = [' %s %s' % (file, call)]
+        out = ['\n %s %s\n' % (file, call)]
         if index is not None:
             i = lnum - index
             for line in lines:
-                num = '%5d ' % i
-                rows.append(num + line.rstrip())
+                out.append('%5d %s\n' % (i, line.rstrip()))
                 i += 1
 
-        done, dump = {}, []
-        for name, where, value in vars:
+        done, dumped = set(), False
+        for name, where, value in names:
             if name in done:
                 continue
-            done[name] = 1
+            done.add(name)
             if value is not __UNDEF__:
-                if where == 'global':
-                    name = 'global ' + name
-                elif where == 'local':
-                    name = name
-                else:
-                    name = where + name.split('.')[-1]
-                dump.append('%s = %s' % (name, pydoc.text.repr(value)))
+                # attributes are already named by their full dotted path
+                name = _WHERE_PREFIX.get(where, '') + name
+                out.append('%s = %s\n' % (name, _repr(value)))
             else:
-                dump.append(name + ' undefined')
-
-        rows.append('\n'.join(dump))
-        frames.append('\n%s\n' % '\n'.join(rows))
-
-    exception = ['%s: %s' % (str(etype), str(evalue))]
-    if isinstance(evalue, types.InstanceType):
-        for name in dir(evalue):
-            value = pydoc.text.repr(getattr(evalue, name))
-            exception.append('\n%s%s = %s' % (" " * 4, name, value))
+                out.append(name + ' undefined\n')
+            dumped = True
+        if not dumped:
+            out.append('\n')
+        yield ''.join(out)
+
+    out = ['%s: %s' % (str(etype), str(evalue))]
+    if isinstance(evalue, BaseException):
+        # only the instance's own attributes, not every method of its class
+        try:
+            attrs = [(name, value) for name, value in vars(evalue).items()
+                     if not name.startswith('__')]
+            attrs.append(('args', evalue.args))
+        except TypeError:
+            attrs = [(name, getattr(evalue, name)) for name in dir(evalue)]
+        for name, value in sorted(attrs):
+            try:
+                value = _repr(value)
+            except Exception:
+                value = '<repr failed>'
+            out.append('\n%s%s = %s' % (" " * 4, name, value))
 
-    import traceback
-    return head + ''.join(frames) + ''.join(exception) + '''
+    out.append('''
 
 The above is a description of an error in a Python program.  Here is
 the original traceback:
 
-%s
-''' % ''.join(traceback.format_exception(etype, evalue, etb))
+''')
+    out.extend(traceback.format_exception(etype, evalue, etb))
+    out.append('\n')
+    yield ''.join(out)
+
+
+# number of VERBOSE commands written before their results are read back
+_VERBOSE_BATCH = 10
+
+
+def _verbose_lines(agi, lines, level):
+    """Send lines as VERBOSE messages, pipelining them in batches.
+
+    AGI commands end at a newline, so each line still needs its own command,
+    but writing a batch before reading the results saves a round trip per
+    line."""
+    for start in range(0, len(lines), _VERBOSE_BATCH):
+        agi.verbose_lines(lines[start:start + _VERBOSE_BATCH], level)
 
 
 class Hook:
     """A hook to replace sys.excepthook that shows tracebacks in HTML."""
 
     def __init__(self, display=1, logdir=None, context=5, file=None,
-                 agi=None):
+                 agi=None, repr=None, skip_prefixes=()):
         self.display = display          # send tracebacks to browser if true
         self.logdir = logdir            # log tracebacks to files if not None
         self.context = context          # number of source code lines per frame
         self.file = file or sys.stderr  # place to send the output
         self.agi = agi
+        self.repr = repr                # formats values, see text()
+        self.skip_prefixes = skip_prefixes  # frames to leave out, see text()
 
     def __call__(self, etype, evalue, etb):
         self.handle((etype, evalue, etb))
 
+    def _chunks(self, info):
+        try:
+            for chunk in _text_chunks(info, self.context, self.repr,
+                                      self.skip_prefixes):
+                yield chunk
+        except Exception:               # just in case something goes wrong
+            yield ''.join(traceback.format_exception(*info))
+
     def handle(self, info=None):
         info = info or sys.exc_info()
 
+        # the document is passed on a chunk at a time rather than built whole
+        out = []    # everything for self.file, written in one go
+        fd = path = None
+        if self.logdir is not None:
+            # a missing or unwritable logdir must not cost us the display
+            try:
+                (fd, path) = tempfile.mkstemp(suffix='.txt', dir=self.logdir)
+            except:
+                pass
+        saved = fd is not None
+        partial = ''    # the unfinished last line of the chunks sent to agi
         try:
-            doc = text(info, self.context)
-        except:                         # just in case something goes wrong
-            import traceback
-            doc = ''.join(traceback.format_exception(*info))
+            for chunk in self._chunks(info):
+                if self.display:
+                    if self.agi:   # print to agi
+                        lines = (partial + chunk).split('\n')
+                        partial = lines.pop()
+                        _verbose_lines(self.agi, lines, 4)
+                    else:
+                        out.append(chunk)
+                if saved:
+                    data = chunk
+                    if not isinstance(data, bytes):
+                        data = data.encode('utf-8', 'replace')
+                    try:
+                        # os.write may write less than it was given
+                        while data:
+                            data = data[os.write(fd, data):]
+                    except:
+                        saved = False
+        finally:
+            if fd is not None:
+                os.close(fd)
 
         if self.display:
-            if self.agi:   # print to agi
-                for line in doc.split('\n'):
-                    self.agi.verbose(line, 4)
+            if self.agi:
+                _verbose_lines(self.agi, [partial], 4)
             else:
-                self.file.write(doc + '\n')
+                out.append('\n')
 
         if self.agi:
             self.agi.verbose('A problem occured in a python script', 4)
         else:
-            self.file.write('A problem occured in a python script\n')
+            out.append('A problem occured in a python script\n')
 
         if self.logdir is not None:
-            import os
-            import tempfile
-            (fd, path) = tempfile.mkstemp(suffix='.txt', dir=self.logdir)
-            try:
-                file = os.fdopen(fd, 'w')
-                file.write(doc)
-                file.close()
+            if saved:
                 msg = '%s contains the description of this error.' % path
-            except:
-                msg = 'Tried to save traceback to %s, but failed.' % path
+            else:
+                msg = 'Tried to save traceback to %s, but failed.' % (
+                    path or self.logdir)
 
             if self.agi:
                 self.agi.verbose(msg, 4)
             else:
-                self.file.write(msg + '\n')
+                out.append(msg + '\n')
 
         try:
+            if out:
+                self.file.write(''.join(out))
             self.file.flush()
         except:
             pass
@@ -234,14 +477,14 @@ class Hook:
 handler = Hook().handle
 
 
-def enable(agi=None, display=1, logdir=None, context=5):
+def enable(agi=None, display=1, logdir=None, context=5, skip_prefixes=()):
     """Install an exception handler that formats tracebacks as HTML.
 
     The optional argument 'display' can be set to 0 to suppress sending the
     traceback to the browser, and 'logdir' can be set to a directory to cause
     tracebacks to be written to files there."""
     except_hook = Hook(display=display, logdir=logdir,
-                       context=context, agi=agi)
+                       context=context, agi=agi, skip_prefixes=skip_prefixes)
     sys.excepthook = except_hook
 
     global handler
@@ -18,45 +18,102 @@ Example
    try:
       config = asterisk.config.Config('/etc/asterisk/extensions.conf')
    except asterisk.config.ParseError as e:
-      print "Parse Error line: %s: %s" % (e.line, e.strerror)
+      line, reason = e.args
+      print("Parse Error line: %s: %s" % (line, reason))
       sys.exit(1)
    except IOError as e:
-      print "Error opening file: %s" % e.strerror
+      print("Error opening file: %s" % e.strerror)
       sys.exit(1)
    
    # print our parsed output
    for category in config.categories:
-      print '[%s]' % category.name   # print the current category
+      print('[%s]' % category.name)   # print the current category
 
       for item in category.items:
-         print '   %s = %s' % (item.name, item.value)
+         print('   %s = %s' % (item.name, item.value))
 
 
 Specification
 -------------
 """
 
+import re
 import sys
 
+from six.moves import intern
+
 
 class ParseError(Exception):
     pass
 
 
+# splits a raw line into its stripped body and comment in one scan
+_LINE_RE = re.compile(r'\s*([^;]*?)\s*(?:;(.*?))?\s*$', re.S)
+
+# configs repeat the same item lines a lot, so parsed items are cached
+_ITEM_CACHE_SIZE = 4096
+_item_cache = {}
+
+# set to True to share equal item values between items as well as names
+INTERN_VALUES = False
+_VALUE_CACHE_SIZE = 4096
+_value_cache = {}
+
+
+def _intern_value(value):
+    """Return the shared copy of an item value"""
+    shared = _value_cache.get(value)
+    if shared is None:
+        if len(_value_cache) >= _VALUE_CACHE_SIZE:
+            _value_cache.clear()
+        shared = _value_cache[value] = value
+    return shared
+
+
+def _parse_item(line):
+    """Return (name, style, value) for an item line, None if it has no '='"""
+    parsed = _item_cache.get(line)
+    if parsed is None:
+        name, sep, value = line.partition('=')
+        if not sep:
+            return None
+        style = ''
+        if value and value[0] == '>':
+            style = '>'  # preserve the style of the original
+            value = value[1:].strip()
+        parsed = (intern(name.strip()), style, value)
+        if len(_item_cache) >= _ITEM_CACHE_SIZE:
+            _item_cache.clear()
+        _item_cache[line] = parsed
+    return parsed
+
+
 class Line(object):
     def __init__(self, line, number):
         self.line = ''
         self.comment = ''
         line = line.strip()    # I guess we don't preserve indentation
         self.number = number
-        parts = line.split(';')
-        if len(parts) >= 2:
-            self.line = parts[0].strip()
-            self.comment = ';'.join(
-                parts[1:])  # Just in case the comment contained ';'
+        idx = line.find(';')
+        if idx >= 0:
+            self.line = line[:idx].strip()
+            self.comment = line[idx + 1:]  # the comment may contain ';'
         else:
             self.line = line
 
+    @classmethod
+    def _from_parts(cls, line, comment, number):
+        """Build from an already split and stripped line without re-parsing"""
+        self = cls.__new__(cls)
+        self.line = line
+        self.comment = comment
+        self.number = number
+        self._finish()
+        return self
+
+    def _finish(self):
+        pass
+
     def __str__(self):
         return self.get_line()
 
@@ -71,11 +128,14 @@ class Line(object):
 class Category(Line):
     def __init__(self, line='', num=-1, name=None):
         Line.__init__(self, line, num)
+        self._finish(name)
+
+    def _finish(self, name=None):
         if self.line:
             if (self.line[0] != '[' or self.line[-1] != ']'):
                 raise ParseError(
                     self.number, "Missing '[' or ']' in category definition")
-            self.name = self.line[1:-1]
+            self.name = intern(self.line[1:-1])
         elif name:
             self.name = name
         else:
@@ -106,6 +166,9 @@ class Category(Line):
 class Item(Line):
     def __init__(self, line='', num=-1, name=None, value=None):
         Line.__init__(self, line, num)
+        self._finish(name, value)
+
+    def _finish(self, name=None, value=None):
         self.style = ''
         if self.line:
             self.parse()
@@ -116,20 +179,16 @@ class Item(Line):
             raise Exception("Must provide name or value representing an item")
 
     def parse(self):
-        try:
-            name, value = self.line.split('=', 1)
-        except ValueError:
+        parsed = _parse_item(self.line)
+        if parsed is None:
             if self.line.strip()[-1] == ']':
                 raise ParseError(self.number, "Category name missing '['")
             else:
                 raise ParseError(
                     self.number, "Item must be in name = value pairs")
-
-        if value and value[0] == '>':
-            self.style = '>'  # preserve the style of the original
-            value = value[1:].strip()
-        self.name = name.strip()
-        self.value = value
+        self.name, self.style, self.value = parsed
+        if INTERN_VALUES:
+            self.value = _intern_value(self.value)
 
     def get_line(self):
         if self.comment:
@@ -140,42 +199,41 @@ class Item(Line):
 class Config(object):
     def __init__(self, filename):
         self.filename = filename
-        self.raw_lines = []     # Holds the raw strings
         self.lines = []         # Holds things in order
         self.categories = []
 
-        # load and parse the file
-        self.load()
+        # parse the file
         self.parse()
 
+    @property
+    def raw_lines(self):
+        """The raw strings of the file, read again on every access"""
+        return self.load()
+
     def load(self):
-        self.raw_lines = open(self.filename).readlines()
-        #try:
-            #self.raw_lines = open(self.filename).readlines()
-        #except IOError:
-            #sys.stderr.write('WARNING: error opening filename: %s  No data read. Starting new file?' % self.filename)
-            #self.raw_lines = []
+        with open(self.filename) as f:
+            return f.readlines()
 
     def parse(self):
         cat = None
-        num = 0
-        for line in self.raw_lines:
-            num += 1
-            line = line.strip()
-            if not line or line[0] == ';':
-                item = Line(line or '', num)
-                self.lines.append(item)
-                if cat:
-                    cat.comments.append(item)
-                continue
-            elif line[0] == '[':
-                cat = Category(line, num)
-                self.lines.append(cat)
-                self.categories.append(cat)
-                continue
-            else:
-                item = Item(line, num)
-                self.lines.append(item)
-                if cat:
-                    cat.append(item)
-                continue
+        with open(self.filename) as f:
+            for num, raw in enumerate(f, 1):
+                line, comment = _LINE_RE.match(raw).groups('')
+                c = line[:1]
+                if not c:
+                    item = Line._from_parts(line, comment, num)
+                    self.lines.append(item)
+                    if cat:
+                        cat.comments.append(item)
+                    continue
+                elif c == '[':
+                    cat = Category._from_parts(line, comment, num)
+                    self.lines.append(cat)
+                    self.categories.append(cat)
+                    continue
+                else:
+                    item = Item._from_parts(line, comment, num)
+                    self.lines.append(item)
+                    if cat:
+                        cat.append(item)
+                    continue
@@ -14,7 +14,8 @@ Specification
 """
 
 import sys
-import SocketServer
+import socket
+from six.moves import socketserver
 import asterisk.agi
 # import pkg_resources
 # PYST_VERSION = pkg_resources.get_distribution("pyst2").version
@@ -24,25 +25,36 @@ __verison__ = 0.1
 #TODO: Read options from config file.
 HOST, PORT = "127.0.0.1", 4573
 
-class FastAGI(SocketServer.StreamRequestHandler):
+class FastAGI(socketserver.StreamRequestHandler):
     # Close connections not finished in 5seconds.
     timeout = 5
+    # AGI is a dialogue of short lines, don't let Nagle hold them back.
+    disable_nagle_algorithm = True
+
     def handle(self):
         try:
             agi=asterisk.agi.AGI(stdin=self.rfile, stdout=self.wfile, stderr=sys.stderr)
             agi.verbose("pyst2: FastAGI on: {}:{}".format(HOST, PORT))
         except TypeError as e:
             sys.stderr.write('Unable to connect to agi://{} {}\n'.format(self.client_address[0], str(e)))
-        except SocketServer.socket.timeout as e:
+        except socket.timeout as e:
             sys.stderr.write('Timeout receiving data from {}\n'.format(self.client_address))
-        except SocketServer.socket.error as e:
+        except socket.error as e:
             sys.stderr.write('Could not open the socket. Is someting else listening on this port?\n')
         except Exception as e:
             sys.stderr.write('An unknown error: {}\n'.format(str(e)))
 
+
+class FastAGIServer(socketserver.ThreadingTCPServer):
+    # AGI sessions mostly wait on Asterisk, so a thread per call is much
+    # cheaper than forking a new interpreter for each one.
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
 if __name__ == "__main__":
-    # server = SocketServer.TCPServer((HOST, PORT), FastAGI)
-    server = SocketServer.ForkingTCPServer((HOST, PORT), FastAGI)
+    server = FastAGIServer((HOST, PORT), FastAGI)
 
     # Keep server running until CTRL-C is pressed.
     server.serve_forever()
@@ -63,23 +63,70 @@ Specification
 
 import sys
 import os
+import collections
+import io
+import itertools
 import socket
 import threading
 import uuid
-from six import PY3
-from six.moves import queue
+from six.moves import intern, queue
 import re
 from types import *
 from time import sleep
 
 EOL = '\r\n'
 
+# header names are shared between messages instead of every message
+# holding its own copies, up to _HEADER_CACHE_SIZE names; the common ones
+# are interned up front so they are the very objects of the string
+# literals used to look them up
+_HEADER_CACHE_SIZE = 1024
+_header_names = dict((name, intern(name)) for name in (
+    'Event', 'Response', 'ActionID', 'Message', 'Privilege', 'Channel',
+    'Uniqueid', 'Linkedid', 'ChannelState', 'ChannelStateDesc',
+    'CallerIDNum', 'CallerIDName', 'ConnectedLineNum', 'ConnectedLineName',
+    'Language', 'AccountCode', 'Context', 'Exten', 'Priority', 'Status',
+    'Cause', 'Cause-txt', 'Application', 'AppData', 'Variable', 'Value',
+    'EventList', 'ListItems', 'SystemName', 'Timestamp'))
+
+# preformatted commands for the simplest actions, filled in with the
+# ActionID and then the arguments by Manager._send_template()
+_ACTION_TEMPLATES = {
+    'Ping': 'Action: Ping\r\nActionID: %s\r\n\r\n',
+    'Logoff': 'Action: Logoff\r\nActionID: %s\r\n\r\n',
+    'Hangup': 'Action: Hangup\r\nActionID: %s\r\nChannel: %s\r\n\r\n',
+    'Command': 'Action: Command\r\nActionID: %s\r\nCommand: %s\r\n\r\n',
+}
+
+
+def _drain(items, ready):
+    """
+    Wait until ready is set, then pop and yield everything in the items
+    deque.  The flag is cleared before draining so an append racing with
+    us sets it again and is picked up on the next call.
+    """
+    ready.wait()
+    ready.clear()
+    popleft = items.popleft
+    while True:
+        try:
+            item = popleft()
+        except IndexError:
+            return
+        yield item
+
 
 class ManagerMsg(object):
-    """A manager interface message"""
+    """
+    A manager interface message
+
+    It is built from the raw bytes of the message, or the list of its
+    lines.  The response attribute is always the list of lines.
+    """
     def __init__(self, response):
-        # the raw response, straight from the horse's mouth:
-        self.response = response
+        # the raw response, straight from the horse's mouth, split into
+        # lines only when asked for, see response
+        self._raw = response
         self.data = ''
         self.headers = {}
 
@@ -110,30 +157,60 @@ class ManagerMsg(object):
     def parse(self, response):
         """Parse a manager message"""
 
-        data = []
-        for n, line in enumerate(response):
+        # the raw bytes of a message, or the list of its lines
+        if isinstance(response, bytes):
+            response = response.decode('utf8', 'ignore')
+        elif isinstance(response, list):
+            response = ''.join(response)
+
+        headers = self.headers
+        pos, size = 0, len(response)
+        while pos < size:
+            end = response.find('\n', pos) + 1
             # all valid header lines end in \r\n in Asterisk<=13
             # and all valid headers lines in Asterisk>13 dont's starts
             # with 'Output:'
-            if not line.endswith('\r\n') or line.startswith('Output:'):
-                data.extend(response[n:])
+            if not end or not response.endswith('\r\n', pos, end) or \
+                    response.startswith('Output:', pos):
                 break
-            try:
-                k, v = (x.strip() for x in line.split(':', 1))
-                # if header is ChanVariable it can have more that one value
-                # we store the variable in a dictionary parsed
-                if 'ChanVariable' in k:
-                    if not self.headers.has_key('ChanVariable'):
-                        self.headers['ChanVariable']={}
-                    name, value = (x.strip() for x in v.split('=',1))
-                    self.headers['ChanVariable'][name]=value
-                else:
-                    self.headers[k] = v
-            except ValueError:
+            k, sep, v = response[pos:end].partition(':')
+            if not sep:
                 # invalid header, start of multi-line data response
-                data.extend(response[n:])
                 break
-        self.data = ''.join(data)
+            k = k.strip()
+            v = v.strip()
+            # if header is ChanVariable it can have more that one value
+            # we store the variable in a dictionary parsed
+            if 'ChanVariable' in k:
+                name, sep, value = v.partition('=')
+                if not sep:
+                    break
+                chanvars = headers.get('ChanVariable')
+                if chanvars is None:
+                    chanvars = headers['ChanVariable'] = {}
+                chanvars[name.strip()] = value.strip()
+            else:
+                name = _header_names.get(k)
+                if name is None:
+                    name = k
+                    if len(_header_names) < _HEADER_CACHE_SIZE:
+                        _header_names[k] = k
+                headers[name] = v
+            pos = end
+        self.data = response[pos:]
+
+    @property
+    def response(self):
+        """The lines of the message, as received"""
+        raw = self._raw
+        if isinstance(raw, bytes):
+            raw = self._raw = io.StringIO(
+                raw.decode('utf8', 'ignore')).readlines()
+        return raw
+
+    @response.setter
+    def response(self, response):
+        self._raw = response
 
     def has_header(self, hname):
         """Check for a header"""
@@ -193,27 +270,40 @@ class Event(object):
 class Manager(object):
     def __init__(self):
         self._sock = None     # our socket
+        self._send_lock = threading.Lock()
         self.title = None     # set by received greeting
         self._connected = threading.Event()
         self._running = threading.Event()
+        # plain copies of the two flags above for the per-message checks,
+        # always updated together with the Events
+        self._is_connected = False
+        self._is_running = False
 
         # our hostname
         self.hostname = socket.gethostname()
         self.actionID_base = str(uuid.uuid4())
 
-        # our queues
-        self._message_queue = queue.Queue()
+        # our queues, events have a single reader so a deque plus an Event
+        # to wake it up is enough, see _drain()
         self._response_queue = queue.Queue()
-        self._event_queue = queue.Queue()
+        self._event_deque = collections.deque()
+        self._event_ready = threading.Event()
 
-        # callbacks for events
+        # callbacks for events, a tuple per event name
         self._event_callbacks = {}
+        # the callbacks to run per event name, '*' included; replaced
+        # with a fresh dict whenever the callbacks change
+        self._dispatch_cache = {}
 
-        self._reswaiting = []  # who is waiting for a response
+        # who is waiting for a response: a list of queues per ActionID,
+        # oldest first as callers may share an ActionID, plus the order
+        # they were sent in for responses that lack an ActionID
+        self._pending = {}
+        self._pending_order = []
+        self._pending_lock = threading.Lock()
 
-        # sequence stuff
-        self._seqlock = threading.Lock()
-        self._seq = 0
+        # sequence stuff, next() on a count is atomic so needs no lock
+        self._seq_counter = itertools.count()
 
         # some threads
         self.message_thread = threading.Thread(target=self.message_loop)
@@ -230,16 +320,11 @@ class Manager(object):
         """
         Check if we are connected or not.
         """
-        return self._connected.isSet()
+        return self._connected.is_set()
 
     def next_seq(self):
         """Return the next number in the sequence, this is used for ActionID"""
-        self._seqlock.acquire()
-        try:
-            return self._seq
-        finally:
-            self._seq += 1
-            self._seqlock.release()
+        return next(self._seq_counter)
 
     def get_actionID(self):
         """
@@ -265,7 +350,7 @@ class Manager(object):
         Variable: var2=value
         """
 
-        if not self._connected.isSet():
+        if not self._is_connected:
             raise ManagerException("Not connected")
 
         # fill in our args
@@ -288,100 +373,144 @@ class Manager(object):
         clist.append(EOL)
         command = EOL.join(clist)
 
+        return self._send_command(str(cdict['ActionID']).strip(), command)
+
+    def _send_template(self, action, *args):
+        """
+        Send one of the fixed _ACTION_TEMPLATES, filled in with a new
+        ActionID and args, and wait for its response.
+        """
+        if not self._is_connected:
+            raise ManagerException("Not connected")
+
+        action_id = self.get_actionID()
+        return self._send_command(
+            action_id, _ACTION_TEMPLATES[action] % ((action_id,) + args))
+
+    def _send_command(self, action_id, command):
+        """Write a formatted command and wait for its response"""
+
+        # wait for the response to this ActionID, not just the next one
+        waiter = queue.Queue()
+        with self._pending_lock:
+            self._pending.setdefault(action_id, []).append(waiter)
+            self._pending_order.append(action_id)
+
         # lock the socket and send our command
         try:
-            self._sock.write(command.encode('utf8','ignore'))
-            # Check if The socket is already closed. May happen after sending "Action: Logoff"
-            if not self._sock.closed:
-                self._sock.flush()
+            with self._send_lock:
+                self._sock.sendall(command.encode('utf8', 'ignore'))
         except socket.error as e:
+            with self._pending_lock:
+                waiters = self._pending.get(action_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._pending[action_id]
+                    self._pending_order.remove(action_id)
             raise ManagerSocketException(e.errno, e.strerror)
 
-        self._reswaiting.insert(0, 1)
-        response = self._response_queue.get()
-        self._reswaiting.pop(0)
+        response = waiter.get()
 
         if not response:
             raise ManagerSocketException(0, 'Connection Terminated')
 
         return response
 
-    def _receive_data(self):
-        """
-        Read the response from a command.
+    def _read_messages(self):
         """
+        Yield the raw bytes of each message read from the socket.
 
-        multiline = False
-        status = False
-        wait_for_marker = False
-        eolcount = 0
-        # loop while we are still running and connected
-        while self._running.isSet() and self._connected.isSet():
-            try:
-                lines = []
-                for line in self._sock:
-                    line = line.decode('utf8','ignore')
+        A message normally ends at a blank line.  Some commands are broken
+        and contain a \n\r\n sequence: after 'Response: Follows' we wait for
+        the --END COMMAND-- marker, and after 'status will follow' for
+        StatusComplete, ignoring embedded blank lines until then.  Framing
+        is done on the raw bytes with find() instead of line by line.
+        """
+        buf = bytearray()
+        start = 0       # where the lines after the last blank line start
+        scan = 0        # where to look for the next blank line
+        follows = status = False
+        greeting = True
+        while True:
+            if start == 0:
+                # ignore empty lines at start
+                while buf[:2] == b'\r\n':
+                    del buf[:2]
+                    scan = 0
+                if greeting and b'\n' in buf:
                     # check to see if this is the greeting line
-                    if not self.title and '/' in line and not ':' in line:
-                        # store the title of the manager we are connecting to:
+                    greeting = False
+                    end = buf.index(b'\n') + 1
+                    line = buf[:end].decode('utf8', 'ignore')
+                    if not self.title and '/' in line and ':' not in line:
+                        del buf[:end]
+                        scan = 0
+                        # store the title and version of the manager we
+                        # are connecting to
                         self.title = line.split('/')[0].strip()
-                        # store the version of the manager we are connecting to:
                         self.version = line.split('/')[1].strip()
                         # fake message header
-                        lines.append('Response: Generated Header\r\n')
-                        lines.append(line)
-                        break
-                    # If the line is EOL marker we have a complete message.
-                    # Some commands are broken and contain a \n\r\n
-                    # sequence, in the case wait_for_marker is set, we
-                    # have such a command where the data ends with the
-                    # marker --END COMMAND--, so we ignore embedded
-                    # newlines until we see that marker
-                    if line == EOL and not wait_for_marker:
-                        multiline = False
-                        if lines or not self._connected.isSet():
-                            break
-                        # ignore empty lines at start
+                        yield b'Response: Generated Header\r\n' + \
+                            line.encode('utf8')
                         continue
-                    # If the user executed the status command, it's a special
-                    # case, so we need to look for a marker.
-                    if 'status will follow' in line:
-                        status = True
-                        wait_for_marker = True
-                    lines.append(line)
-
-                    # line not ending in \r\n or without ':' isn't a
-                    # valid header and starts multiline response
-                    if not line.endswith('\r\n') or ':' not in line:
-                        multiline = True
-                    # Response: Follows indicates we should wait for end
-                    # marker --END COMMAND--
-                    if not (multiline or status) and line.startswith('Response') and \
-                            line.split(':', 1)[1].strip() == 'Follows':
-                        wait_for_marker = True
-                    # same when seeing end of multiline response
-                    if multiline and (line.startswith('--END COMMAND--') or line.strip().endswith('--END COMMAND--')):
-                        wait_for_marker = False
-                        multiline = False
-                    # same when seeing end of status response
-                    if status and 'StatusComplete' in line:
-                        wait_for_marker = False
-                        status = False
-                    if not self._connected.isSet():
-                        break
-                else:
-                    # EOF during reading
-                    self._sock.close()
-                    self._connected.clear()
-                # if we have a message append it to our queue
-                if lines and self._connected.isSet():
-                    self._message_queue.put(lines)
-                else:
-                    self._message_queue.put(None)
-            except socket.error:
-                self._sock.close()
-                self._connected.clear()
-                self._message_queue.put(None)
+
+            idx = -1 if greeting else buf.find(b'\n\r\n', scan)
+            if idx < 0:
+                if not greeting:
+                    scan = max(len(buf) - 2, start)
+                data = self._sock.recv(self._recv_size)
+                if not data:
+                    return
+                buf += data
+                continue
+
+            # look at the lines added since the last blank line
+            end = idx + 1
+            if start == 0:
+                follows = buf.startswith(b'Response: Follows\r\n')
+                status = False
+            if follows and buf.find(b'--END COMMAND--', start, end) >= 0:
+                follows = False
+            complete = buf.rfind(b'StatusComplete', start, end)
+            if buf.rfind(b'status will follow', start, end) > complete:
+                status = True
+            elif complete >= 0:
+                status = False
+            if follows or status:
+                # the blank line is part of the message, keep going
+                start = scan = idx + 3
+                continue
+
+            message = bytes(buf[:end])
+            del buf[:idx + 3]
+            start = scan = 0
+            yield message
+
+    def _pop_waiter(self, action_id=None):
+        """
+        Remove and return the oldest queue waiting for the response to
+        action_id.  Without an ActionID the response goes to the oldest
+        waiter.
+        """
+        with self._pending_lock:
+            if action_id is None:
+                if not self._pending_order:
+                    return None
+                action_id = self._pending_order[0]
+            waiters = self._pending.get(action_id)
+            if not waiters:
+                return None
+            waiter = waiters.pop(0)
+            if not waiters:
+                del self._pending[action_id]
+            self._pending_order.remove(action_id)
+            return waiter
+
+    def _close_socket(self):
+        self._sock.close()
+        self._is_connected = False
+        self._connected.clear()
 
     def register_event(self, event, function):
         """
@@ -390,44 +519,32 @@ class Manager(object):
         event will be executed.
         """
 
-        # get the current value, or an empty list
-        # then add our new callback
-        current_callbacks = self._event_callbacks.get(event, [])
-        current_callbacks.append(function)
-        self._event_callbacks[event] = current_callbacks
+        # get the current value, or an empty tuple
+        # then add our new callback, the tuples are never modified in
+        # place so a dispatch running concurrently is not affected
+        current_callbacks = self._event_callbacks.get(event, ())
+        self._event_callbacks[event] = current_callbacks + (function,)
+        self._dispatch_cache = {}
 
     def unregister_event(self, event, function):
         """
         Unregister a callback for the specified event.
         """
-        current_callbacks = self._event_callbacks.get(event, [])
+        current_callbacks = list(self._event_callbacks.get(event, ()))
         current_callbacks.remove(function)
-        self._event_callbacks[event] = current_callbacks
+        self._event_callbacks[event] = tuple(current_callbacks)
+        self._dispatch_cache = {}
 
     def message_loop(self):
         """
-        The method for the event thread.
-        This actually recieves all types of messages and places them
-        in the proper queues.
+        The method for the message thread.
+        This reads all types of messages from the socket, parses them and
+        places them in the proper queues.
         """
 
-        # start a thread to recieve data
-        t = threading.Thread(target=self._receive_data)
-        t.setDaemon(True)
-        t.start()
-
         try:
-            # loop getting messages from the queue
-            while self._running.isSet():
-                # get/wait for messages
-                data = self._message_queue.get()
-
-                # if we got None as our message we are done
-                if not data:
-                    # notify the other queues
-                    self._event_queue.put(None)
-                    for waiter in self._reswaiting:
-                        self._response_queue.put(None)
+            for data in self._read_messages():
+                if not self._is_connected:
                     break
 
                 # parse the data
@@ -435,43 +552,72 @@ class Manager(object):
 
                 # check if this is an event message
                 if message.has_header('Event'):
-                    self._event_queue.put(Event(message))
+                    self._event_deque.append(Event(message))
+                    self._event_ready.set()
                 # check if this is a response
                 elif message.has_header('Response'):
-                    self._response_queue.put(message)
+                    action_id = message.get_header('ActionID')
+                    waiter = self._pop_waiter(action_id)
+                    if waiter is None and action_id is not None:
+                        # an ActionID we did not send, treat it as missing
+                        waiter = self._pop_waiter()
+                    if waiter is not None:
+                        waiter.put(message)
+                    else:
+                        # e.g. the greeting, which connect() waits for
+                        self._response_queue.put(message)
                 else:
                     print('No clue what we got\n%s' % message.data)
-        finally:
-            # wait for our data receiving thread to exit
-            t.join()
+
+                if not self._is_running:
+                    break
+            else:
+                # EOF during reading
+                self._close_socket()
+        except socket.error:
+            self._close_socket()
+
+        # we are done, notify the other queues
+        self._event_deque.append(None)
+        self._event_ready.set()
+        with self._pending_lock:
+            for waiters in self._pending.values():
+                for waiter in waiters:
+                    waiter.put(None)
+            self._pending.clear()
+            del self._pending_order[:]
 
     def event_dispatch(self):
         """This thread is responsible for dispatching events"""
 
         # loop dispatching events
-        while self._running.isSet():
-            # get/wait for an event
-            ev = self._event_queue.get()
-
-            # if we got None as an event, we are finished
-            if not ev:
-                break
-
-            # dispatch our events
-
-            # first build a list of the functions to execute
-            callbacks = (self._event_callbacks.get(ev.name, [])
-                         + self._event_callbacks.get('*', []))
-
-            # now execute the functions
-            for callback in callbacks:
-                if callback(ev, self):
-                    break
+        while self._running.is_set():
+            # get/wait for events
+            for ev in _drain(self._event_deque, self._event_ready):
+                # if we got None as an event, we are finished
+                if not ev:
+                    return
+
+                # dispatch our events
+
+                # first get the functions to execute, building the list
+                # only the first time this event is seen
+                cache = self._dispatch_cache
+                callbacks = cache.get(ev.name)
+                if callbacks is None:
+                    callbacks = cache[ev.name] = (
+                        self._event_callbacks.get(ev.name, ())
+                        + self._event_callbacks.get('*', ()))
+
+                # now execute the functions
+                for callback in callbacks:
+                    if callback(ev, self):
+                        break
 
     def connect(self, host, port=5038, buffer_size=0):
         """Connect to the manager interface"""
 
-        if self._connected.isSet():
+        if self._connected.is_set():
             raise ManagerException('Already connected to manager')
 
         # make sure host is a string
@@ -482,17 +628,15 @@ class Manager(object):
 
         # create our socket and connect
         try:
-            _sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            _sock.connect((host, port))
-            if PY3:
-                self._sock = _sock.makefile(mode='rwb', buffering=buffer_size)
-            else:
-                self._sock = _sock.makefile()
-            _sock.close()
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.connect((host, port))
+            # how much to read at a time, see _read_messages
+            self._recv_size = buffer_size or 65536
         except socket.error as e:
             raise ManagerSocketException(e.errno, e.strerror)
 
         # we are connected and running
+        self._is_connected = self._is_running = True
         self._connected.set()
         self._running.set()
 
@@ -509,12 +653,16 @@ class Manager(object):
         """Shutdown the connection to the manager"""
 
         # if we are still running, logout
-        if self._running.isSet() and self._connected.isSet():
+        if self._running.is_set() and self._connected.is_set():
             self.logoff()
 
-        if self._running.isSet():
-            # put None in the message_queue to kill our threads
-            self._message_queue.put(None)
+        if self._running.is_set():
+            # wake the message thread if it is still waiting on the socket
+            if self._connected.is_set():
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
 
             # wait for the event thread to exit
             self.message_thread.join()
@@ -524,6 +672,7 @@ class Manager(object):
                 # wait for the dispatch thread to exit
                 self.event_dispatch_thread.join()
 
+        self._is_running = False
         self._running.clear()
 
 # Manager actions
@@ -543,35 +692,20 @@ class Manager(object):
 
     def ping(self):
         """Send a ping action to the manager"""
-        cdict = {'Action': 'Ping'}
-        response = self.send_action(cdict)
-        return response
+        return self._send_template('Ping')
 
     def logoff(self):
         """Logoff from the manager"""
-
-        cdict = {'Action': 'Logoff'}
-        response = self.send_action(cdict)
-
-        return response
+        return self._send_template('Logoff')
 
     def hangup(self, channel):
         """Hangup the specified channel"""
-
-        cdict = {'Action': 'Hangup'}
-        cdict['Channel'] = channel
-        response = self.send_action(cdict)
-
-        return response
+        return self._send_template('Hangup', channel)
 
     def status(self, channel=''):
         """Get a status message from asterisk"""
 
-        cdict = {'Action': 'Status'}
-        cdict['Channel'] = channel
-        response = self.send_action(cdict)
-
-        return response
+        return self.send_action({'Action': 'Status', 'Channel': channel})
 
     def redirect(self, channel, exten, priority='1', extra_channel='', context=''):
         """Redirect a channel"""
@@ -626,113 +760,82 @@ class Manager(object):
     def mailbox_status(self, mailbox):
         """Get the status of the specified mailbox"""
 
-        cdict = {'Action': 'MailboxStatus'}
-        cdict['Mailbox'] = mailbox
-        response = self.send_action(cdict)
-
-        return response
+        return self.send_action({
+            'Action': 'MailboxStatus',
+            'Mailbox': mailbox})
 
     def command(self, command):
         """Execute a command"""
-
-        cdict = {'Action': 'Command'}
-        cdict['Command'] = command
-        response = self.send_action(cdict)
-
-        return response
+        return self._send_template('Command', command)
 
     def extension_state(self, exten, context):
         """Get the state of an extension"""
 
-        cdict = {'Action': 'ExtensionState'}
-        cdict['Exten'] = exten
-        cdict['Context'] = context
-        response = self.send_action(cdict)
-
-        return response
+        return self.send_action({
+            'Action': 'ExtensionState',
+            'Exten': exten,
+            'Context': context})
 
     def playdtmf(self, channel, digit):
         """Plays a dtmf digit on the specified channel"""
 
-        cdict = {'Action': 'PlayDTMF'}
-        cdict['Channel'] = channel
-        cdict['Digit'] = digit
-        response = self.send_action(cdict)
-
-        return response
+        return self.send_action({
+            'Action': 'PlayDTMF',
+            'Channel': channel,
+            'Digit': digit})
 
     def absolute_timeout(self, channel, timeout):
         """Set an absolute timeout on a channel"""
 
-        cdict = {'Action': 'AbsoluteTimeout'}
-        cdict['Channel'] = channel
-        cdict['Timeout'] = timeout
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({
+            'Action': 'AbsoluteTimeout',
+            'Channel': channel,
+            'Timeout': timeout})
 
     def mailbox_count(self, mailbox):
-        cdict = {'Action': 'MailboxCount'}
-        cdict['Mailbox'] = mailbox
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'MailboxCount', 'Mailbox': mailbox})
 
     def sippeers(self):
-        cdict = {'Action': 'Sippeers'}
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'Sippeers'})
 
     def sipshowpeer(self, peer):
-        cdict = {'Action': 'SIPshowpeer'}
-        cdict['Peer'] = peer
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'SIPshowpeer', 'Peer': peer})
 
     def sipshowregistry(self):
-        cdict = {'Action': 'SIPShowregistry'}
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'SIPShowregistry'})
 
     def iaxregistry(self):
-        cdict = {'Action': 'IAXregistry'}
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'IAXregistry'})
 
     def reload(self, module):
         """ Reloads config for a given module """
 
-        cdict = {'Action': 'Reload'}
-        cdict['Module'] = module
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({'Action': 'Reload', 'Module': module})
 
     def dbdel(self, family, key):
-        cdict = {'Action': 'DBDel'}
-        cdict['Family'] = family
-        cdict['Key'] = key
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({
+            'Action': 'DBDel',
+            'Family': family,
+            'Key': key})
 
     def dbdeltree(self, family, key):
-        cdict = {'Action': 'DBDelTree'}
-        cdict['Family'] = family
-        cdict['Key'] = key
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({
+            'Action': 'DBDelTree',
+            'Family': family,
+            'Key': key})
 
     def dbget(self, family, key):
-        cdict = {'Action': 'DBGet'}
-        cdict['Family'] = family
-        cdict['Key'] = key
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({
+            'Action': 'DBGet',
+            'Family': family,
+            'Key': key})
 
     def dbput(self, family, key, val):
-        cdict = {'Action': 'DBPut'}
-        cdict['Family'] = family
-        cdict['Key'] = key
-        cdict['Val'] = val
-        response = self.send_action(cdict)
-        return response
+        return self.send_action({
+            'Action': 'DBPut',
+            'Family': family,
+            'Key': key,
+            'Val': val})
 
 class ManagerException(Exception):
     pass
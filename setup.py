@@ -1,9 +1,19 @@
 """Packaging files and information."""
 
 
+import io
+import re
+
 from setuptools import setup
 
-from asterisk import __version__ as version
+
+# Read the version without importing the asterisk package.
+with io.open('asterisk/__init__.py', encoding='utf-8') as f:
+    version = re.search(
+        r"^__version__\s*=\s*['\"]([^'\"]+)['\"]", f.read(), re.M).group(1)
+
+with io.open('README.rst', encoding='utf-8') as f:
+    long_description = f.read()
 
 
 setup(
@@ -19,6 +29,7 @@ setup(
 
     # Package dependencies:
     install_requires = ['six>=1.9.0'],
+    python_requires = '>=2.7, !=3.0.*, !=3.1.*, !=3.2.*',
 
     # Metadata for PyPI:
     author = 'Randall Degges',
@@ -27,7 +38,7 @@ setup(
     url = 'https://github.com/rdegges/pyst2',
     keywords = 'python asterisk agi ami telephony telephony sip voip',
     description = 'A Python Interface to Asterisk',
-    long_description = open('README.rst').read(),
+    long_description = long_description,
 
     # Classifiers:
     platforms = 'Any',
@@ -38,12 +49,9 @@ setup(
         'Intended Audience :: Telecommunications Industry',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2.6',
+        'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
         'Topic :: Communications :: Internet Phone',
         'Topic :: Communications :: Telephony',
         'Topic :: Software Development :: Libraries :: Python Modules'
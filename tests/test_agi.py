@@ -0,0 +1,166 @@
+import io
+import os
+import signal
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import TestCase
+from asterisk.agi import AGI, AGIError, AGIInvalidCommand, AGIUnknownError, \
+    AGIUsageError, AGISIGHUPHangup
+
+
+ENV = 'agi_channel: SIP/1000-00000001\nagi_context: default\n\n'
+
+
+def make_agi(responses=''):
+    """ build an AGI instance talking to in-memory streams """
+    return AGI(stdin=StringIO(ENV + responses), stdout=StringIO(),
+               stderr=StringIO())
+
+
+class TestGetResult(TestCase):
+    def test_env(self):
+        agi = make_agi()
+        self.assertEqual(agi.env['agi_channel'], 'SIP/1000-00000001')
+        self.assertEqual(agi.env['agi_context'], 'default')
+
+    def test_result_with_data(self):
+        agi = make_agi('200 result=1 (some value)\n')
+        result = agi.get_result()
+        self.assertEqual(result['result'], ('1', 'some value'))
+
+    def test_result_without_data(self):
+        agi = make_agi('200 result=0 endpos=1234\n')
+        result = agi.get_result()
+        self.assertEqual(result['result'], ('0', ''))
+        self.assertEqual(result['endpos'], ('1234', ''))
+
+    def test_invalid_command(self):
+        agi = make_agi('510 Invalid or unknown command\n')
+        self.assertRaises(AGIInvalidCommand, agi.get_result)
+
+    def test_usage(self):
+        agi = make_agi('520-Invalid command syntax.  Proper usage follows:\n'
+                       'Usage: ANSWER\n'
+                       '520 End of proper usage.\n')
+        with self.assertRaises(AGIUsageError) as cm:
+            agi.get_result()
+        self.assertEqual(cm.exception.args[0],
+                         '520-Invalid command syntax.  Proper usage follows:\n'
+                         'Usage: ANSWER\n'
+                         '520 End of proper usage.\n')
+
+    def test_usage_eof(self):
+        agi = make_agi('520-Invalid command syntax.  Proper usage follows:\n')
+        self.assertRaises(AGIUsageError, agi.get_result)
+
+    def test_override_handler(self):
+        class MyAGI(AGI):
+            def _result_invalid(self, line, response, stdin):
+                return response
+        agi = MyAGI(stdin=StringIO(ENV + '510 Invalid or unknown command\n'),
+                    stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(agi.get_result(), 'Invalid or unknown command')
+
+    def test_unknown_code(self):
+        agi = make_agi('garbage\n')
+        self.assertRaises(AGIUnknownError, agi.get_result)
+
+
+class TestSendCommand(TestCase):
+    def test_send_command(self):
+        agi = make_agi()
+        agi.send_command('STREAM FILE', 'hello', '""', 0)
+        agi.send_command('HANGUP', '')
+        agi.send_command('ANSWER')
+        self.assertEqual(agi.stdout.getvalue(),
+                         'STREAM FILE hello "" 0\nHANGUP\nANSWER\n')
+
+    def test_send_command_binary(self):
+        """ FastAGI hands us the binary socket files """
+        agi = AGI(stdin=BytesIO((ENV + '200 result=0\n').encode('utf8')),
+                  stdout=BytesIO(), stderr=StringIO())
+        agi.verbose(u'caf\xe9')
+        self.assertEqual(agi.stdout.getvalue(),
+                         u'VERBOSE "caf\xe9" 1\n'.encode('utf8'))
+
+    def test_send_command_text_buffer(self):
+        """ text queued on a wrapped stdout is written before our command """
+        raw = BytesIO()
+        stdout = io.TextIOWrapper(raw, encoding='utf8')
+        agi = AGI(stdin=StringIO(ENV), stdout=stdout, stderr=StringIO())
+        stdout.write(u'queued\n')
+        agi.send_command('ANSWER')
+        self.assertEqual(raw.getvalue(), b'queued\nANSWER\n')
+
+    def test_send_command_text_file(self):
+        """ text streams that are not TextIOBase still get str """
+        stdout = tempfile.SpooledTemporaryFile(mode='w+')
+        self.addCleanup(stdout.close)
+        agi = AGI(stdin=StringIO(ENV), stdout=stdout, stderr=StringIO())
+        agi.send_command('ANSWER')
+        stdout.seek(0)
+        self.assertEqual(stdout.read(), 'ANSWER\n')
+
+
+class TestExecuteMany(TestCase):
+    def test_results(self):
+        agi = make_agi('200 result=1\n200 result=0\n')
+        results = agi.execute_many([('ANSWER',), ('SAY DIGITS', '"1"', '""')])
+        self.assertEqual([r['result'] for r in results], [('1', ''), ('0', '')])
+        self.assertEqual(agi.stdout.getvalue(),
+                         'ANSWER\nSAY DIGITS "1" ""\n')
+
+    def test_error_reads_all_results(self):
+        """ a failing command does not leave later results unread """
+        agi = make_agi('510 Invalid or unknown command\n200 result=0\n'
+                       '200 result=1 (next)\n')
+        self.assertRaises(AGIInvalidCommand, agi.verbose_lines, ['a', 'b'])
+        self.assertEqual(agi.stdout.getvalue(),
+                         'VERBOSE "a" 1\nVERBOSE "b" 1\n')
+        self.assertEqual(agi.get_result()['result'], ('1', 'next'))
+
+
+class TestDigits(TestCase):
+    def test_wait_for_digit(self):
+        agi = make_agi('200 result=49\n200 result=0\n200 result=foo\n')
+        self.assertEqual(agi.wait_for_digit(), '1')
+        self.assertEqual(agi.wait_for_digit(), '')
+        self.assertRaises(AGIError, agi.wait_for_digit)
+
+    def test_process_digit_list(self):
+        agi = make_agi()
+        self.assertEqual(agi._process_digit_list('123'), '"123"')
+        self.assertEqual(agi._process_digit_list([1, '2', 3]), '"123"')
+        self.assertEqual(agi._process_digit_list((4, 5)), '"45"')
+        self.assertEqual(agi._process_digit_list(6), '"6"')
+
+
+class TestDatabase(TestCase):
+    def test_database_get(self):
+        agi = make_agi('200 result=1 (bar)\n')
+        self.assertEqual(agi.database_get('foo', 'baz'), 'bar')
+        self.assertEqual(agi.stdout.getvalue(), 'DATABASE GET "foo" "baz"\n')
+
+
+class TestSighup(TestCase):
+    def test_sighup(self):
+        agi1, agi2 = make_agi(), make_agi()
+        agi1.test_hangup()
+        os.kill(os.getpid(), signal.SIGHUP)
+        self.assertRaises(AGISIGHUPHangup, agi1.test_hangup)
+        self.assertRaises(AGISIGHUPHangup, agi2.test_hangup)
+        # a later instance, e.g. the next FastAGI request, is not hung up
+        make_agi().test_hangup()
+
+    def test_install_off_main_thread(self):
+        """ the handler is installed by the first main thread instance """
+        installed = AGI._sighup_installed
+        self.addCleanup(setattr, AGI, '_sighup_installed', installed)
+        AGI._sighup_installed = False
+        thread = threading.Thread(target=make_agi)
+        thread.start()
+        thread.join()
+        self.assertFalse(AGI._sighup_installed)
+        make_agi()
+        self.assertTrue(AGI._sighup_installed)
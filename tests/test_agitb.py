@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from io import StringIO
+from unittest import TestCase
+from asterisk import agitb
+from asterisk.agi import AGI
+
+
+def make_reader(source):
+    lines = iter(source.splitlines(True))
+    return lambda: next(lines, '')
+
+
+class TestScanvars(TestCase):
+    def scan(self, source, **locals):
+        frame = sys._getframe()
+        return [(name, where, value) for name, where, value
+                in agitb.scanvars(make_reader(source), frame, locals)]
+
+    def test_names_and_attributes(self):
+        vars = self.scan("x = foo.bar + len(y)  # z\nother\n",
+                         x=1, y=[2], foo=sys)
+        self.assertEqual([name for name, where, value in vars],
+                         ['x', 'foo', 'foo.bar', 'len', 'y'])
+        self.assertEqual(vars[0], ('x', 'local', 1))
+        self.assertEqual(vars[3], ('len', 'builtin', len))
+
+    def test_skips_strings_numbers_and_keywords(self):
+        vars = self.scan("if a and 'b.c' + r\"d\" != 1e5: pass\n", a=1)
+        self.assertEqual([name for name, where, value in vars], ['a'])
+
+    def test_continuation_lines(self):
+        vars = self.scan("f(a,\n  '''x\ny''',\n  b)\nc\n", a=1, b=2)
+        self.assertEqual([name for name, where, value in vars],
+                         ['f', 'a', 'b'])
+
+
+class CodeError(Exception):
+    def __init__(self, message, code):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def fail(a, b=2):
+    x = {'k': a}
+    raise CodeError('bad %s' % x['k'], 42)
+
+
+class TestText(TestCase):
+    def test_text(self):
+        try:
+            fail(1)
+        except CodeError:
+            doc = agitb.text(sys.exc_info(), 2)
+        self.assertTrue(doc.startswith('CodeError\n'))
+        self.assertIn(' in fail(a=1, b=2)\n', doc)
+        self.assertIn("\nx = {'k': 1}\n", doc)
+        self.assertIn("CodeError: bad 1\n    args = ('bad 1',)\n"
+                      "    code = 42\n", doc)
+        self.assertTrue(doc.endswith('CodeError: bad 1\n\n'))
+
+    def test_exception_attributes(self):
+        """ only the exception's own attributes and args are listed """
+        try:
+            fail(1)
+        except CodeError:
+            doc = agitb.text(sys.exc_info(), 2)
+        dump = doc.split('CodeError: bad 1\n', 1)[1].split('\n\n', 1)[0]
+        self.assertEqual(dump, "    args = ('bad 1',)\n    code = 42")
+
+
+class TestFastRepr(TestCase):
+    def test_truncates(self):
+        self.assertEqual(agitb._fast_repr('x'), "'x'")
+        self.assertEqual(agitb._fast_repr(list(range(100)), 10),
+                         '[0, 1, 2, ...')
+
+    def test_repr_failed(self):
+        class Broken(object):
+            def __repr__(self):
+                raise ValueError
+        self.assertEqual(agitb._fast_repr(Broken()), '<repr failed>')
+
+
+class TestFrameRecords(TestCase):
+    def test_skip_prefixes(self):
+        try:
+            json.loads('{')
+        except ValueError:
+            etb = sys.exc_info()[2]
+        prefix = os.path.dirname(json.__file__)
+        files = [r[1] for r in agitb._frame_records(etb, 1, ())]
+        self.assertTrue(len(files) > 2)
+        skipped = agitb._frame_records(etb, 1, (prefix + os.sep,))
+        # only this frame and the innermost one, where the error happened
+        self.assertEqual([r[1] for r in skipped], [files[0], files[-1]])
+
+
+class TestHook(TestCase):
+    def test_agi_verbose(self):
+        agi = AGI(stdin=StringIO('agi_context: default\n\n' +
+                                 '200 result=1\n' * 100),
+                  stdout=StringIO(), stderr=StringIO())
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            info = sys.exc_info()
+        agitb.Hook(agi=agi).handle(info)
+        sent = agi.stdout.getvalue().splitlines()
+        self.assertEqual(sent[-1],
+                         'VERBOSE "A problem occured in a python script" 4')
+        self.assertTrue(all(line.startswith('VERBOSE "') for line in sent))
+        # every command's result was read back, in order
+        self.assertEqual(agi.stdin.read(), '200 result=1\n' * (100 - len(sent)))
+
+    def test_file(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            info = sys.exc_info()
+        out = StringIO()
+        agitb.Hook(file=out).handle(info)
+        self.assertIn('ZeroDivisionError', out.getvalue())
+        self.assertTrue(out.getvalue().endswith(
+            '\nA problem occured in a python script\n'))
+
+    def test_missing_logdir(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            info = sys.exc_info()
+        out = StringIO()
+        logdir = os.path.join(os.path.dirname(__file__), 'no-such-dir')
+        agitb.Hook(file=out, logdir=logdir).handle(info)
+        self.assertIn('ZeroDivisionError', out.getvalue())
+        self.assertTrue(out.getvalue().endswith(
+            'Tried to save traceback to %s, but failed.\n' % logdir))
+
+    def test_short_writes(self):
+        """ the log gets the whole document even if os.write is short """
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            info = sys.exc_info()
+        logdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logdir)
+        write = os.write
+        self.addCleanup(setattr, agitb.os, 'write', write)
+        agitb.os.write = lambda fd, data: write(fd, data[:7])
+        out = StringIO()
+        agitb.Hook(file=out, logdir=logdir).handle(info)
+        path = os.path.join(logdir, os.listdir(logdir)[0])
+        with open(path) as f:
+            logged = f.read()
+        self.assertEqual(logged, agitb.text(info))
+        self.assertIn('%s contains the description' % path, out.getvalue())
@@ -1,6 +1,5 @@
 from unittest import TestCase
 from asterisk.manager import Manager
-from itertools import combinations
 
 
 class TestBasic(TestCase):
@@ -12,11 +11,22 @@ class TestBasic(TestCase):
 
         manager1 = Manager()
         manager2 = Manager()
-        actionIDs = [
-            manager1.get_actionID(),
-            manager1.get_actionID(),
-            manager2.get_actionID(),
-            manager2.get_actionID(),
-        ]
-        for a, b in combinations(actionIDs, 2):
-            self.assertNotEqual(a, b)
+        actionIDs = []
+        for i in range(1000):
+            actionIDs.append(manager1.get_actionID())
+            actionIDs.append(manager2.get_actionID())
+        self.assertEqual(len(set(actionIDs)), len(actionIDs))
+
+    def test_action_id_uses_next_seq(self):
+        """ subclasses can control the sequence part of actionIDs """
+        class FixedManager(Manager):
+            def next_seq(self):
+                return 0x2a
+        manager = FixedManager()
+        self.assertTrue(manager.get_actionID().endswith('-0000002a'))
+
+    def test_action_id_base(self):
+        """ actionID_base can be changed to tag the actionIDs """
+        manager = Manager()
+        manager.actionID_base = 'mytag'
+        self.assertTrue(manager.get_actionID().startswith('mytag-'))
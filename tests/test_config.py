@@ -0,0 +1,65 @@
+import os
+import tempfile
+from unittest import TestCase
+from asterisk import config as config_module
+from asterisk.config import Config, ParseError
+
+
+CONF = """; leading comment
+[general]\t; general settings
+static =yes
+writeprotect => no ; comment; with semicolon
+
+[default]
+exten => 1000,1,Answer()
+"""
+
+
+class TestConfig(TestCase):
+    def load(self, text):
+        fd, path = tempfile.mkstemp(suffix='.conf')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        return Config(path)
+
+    def test_parse(self):
+        config = self.load(CONF)
+        self.assertEqual([c.name for c in config.categories],
+                         ['general', 'default'])
+        general, default = config.categories
+        self.assertEqual(general.comment, ' general settings')
+        self.assertEqual([(i.name, i.style, i.value) for i in general.items],
+                         [('static', '', 'yes'), ('writeprotect', '>', 'no')])
+        self.assertEqual(general.items[1].comment, ' comment; with semicolon')
+        self.assertEqual(default.items[0].value, '1000,1,Answer()')
+        self.assertEqual(len(config.lines), 7)
+        self.assertEqual([l.number for l in config.lines], list(range(1, 8)))
+
+    def test_get_line(self):
+        config = self.load(CONF)
+        self.assertEqual([l.get_line() for l in config.lines], [
+            '; leading comment',
+            '[general]\t; general settings',
+            'static = yes',
+            'writeprotect => no\t; comment; with semicolon',
+            '',
+            '[default]',
+            'exten => 1000,1,Answer()',
+        ])
+
+    def test_parse_error(self):
+        self.assertRaises(ParseError, self.load, '[general]\nnovalue\n')
+        self.assertRaises(ParseError, self.load, 'general]\n')
+
+    def test_raw_lines(self):
+        config = self.load(CONF)
+        self.assertEqual(config.raw_lines, CONF.splitlines(True))
+
+    def test_intern(self):
+        self.addCleanup(setattr, config_module, 'INTERN_VALUES', False)
+        config_module.INTERN_VALUES = True
+        config = self.load('[a]\nhost =dynamic\n[b]\nhost  =dynamic\n')
+        first, second = [c.items[0] for c in config.categories]
+        self.assertIs(first.name, second.name)
+        self.assertIs(first.value, second.value)
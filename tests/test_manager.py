@@ -0,0 +1,186 @@
+import socket
+import threading
+from unittest import TestCase
+from asterisk.manager import Event, Manager, ManagerMsg
+
+
+class FakeSocket(object):
+    """ hands out the data a few bytes at a time, like a slow network """
+    def __init__(self, data, size=7):
+        self.data = data
+        self.size = size
+
+    def recv(self, bufsize):
+        data, self.data = self.data[:self.size], self.data[self.size:]
+        return data
+
+
+def read_messages(data):
+    manager = Manager()
+    manager._sock = FakeSocket(data)
+    manager._recv_size = 4096
+    return list(manager._read_messages()), manager
+
+
+class TestReadMessages(TestCase):
+    def test_greeting_and_messages(self):
+        messages, manager = read_messages(
+            b'Asterisk Call Manager/5.0.1\r\n'
+            b'\r\nResponse: Success\r\nActionID: 1\r\n\r\n'
+            b'Event: Hangup\r\nChannel: SIP/1\r\n\r\n')
+        self.assertEqual(messages, [
+            b'Response: Generated Header\r\nAsterisk Call Manager/5.0.1\r\n',
+            b'Response: Success\r\nActionID: 1\r\n',
+            b'Event: Hangup\r\nChannel: SIP/1\r\n',
+        ])
+        self.assertEqual(manager.title, 'Asterisk Call Manager')
+        self.assertEqual(manager.version, '5.0.1')
+
+    def test_command_output(self):
+        """ old style command output may contain blank lines """
+        messages, manager = read_messages(
+            b'Asterisk Call Manager/1.1\r\n'
+            b'Response: Follows\r\nPrivilege: Command\r\n'
+            b'one\n\r\ntwo\n--END COMMAND--\r\n\r\n'
+            b'Event: Reload\r\n\r\n')
+        self.assertEqual(messages[1:], [
+            b'Response: Follows\r\nPrivilege: Command\r\n'
+            b'one\n\r\ntwo\n--END COMMAND--\r\n',
+            b'Event: Reload\r\n',
+        ])
+
+    def test_status(self):
+        messages, manager = read_messages(
+            b'Asterisk Call Manager/1.1\r\n'
+            b'Response: Success\r\nMessage: Channel status will follow\r\n\r\n'
+            b'Event: Status\r\nChannel: SIP/1\r\n\r\n'
+            b'Event: StatusComplete\r\nItems: 1\r\n\r\n'
+            b'Event: Reload\r\n\r\n')
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(messages[1].endswith(b'Event: StatusComplete\r\n'
+                                             b'Items: 1\r\n'))
+
+
+class TestManagerMsg(TestCase):
+    def test_headers_and_data(self):
+        msg = ManagerMsg(b'Response: Follows\r\nPrivilege: Command\r\n'
+                         b'Name: Value: with colon \r\n'
+                         b'no header here\n--END COMMAND--\r\n')
+        self.assertEqual(msg.headers, {'Response': 'Follows',
+                                       'Privilege': 'Command',
+                                       'Name': 'Value: with colon'})
+        self.assertEqual(msg.data, 'no header here\n--END COMMAND--\r\n')
+
+    def test_response_lines(self):
+        msg = ManagerMsg(b'Response: Success\r\nMessage: caf\xc3\xa9\r\n')
+        self.assertEqual(msg.response, ['Response: Success\r\n',
+                                        u'Message: caf\xe9\r\n'])
+        lines = ['Event: Hangup\r\n', 'Channel: SIP/1\r\n']
+        self.assertEqual(ManagerMsg(lines).response, lines)
+
+    def test_chan_variable(self):
+        msg = ManagerMsg(b'Event: Status\r\n'
+                         b'ChanVariable(SIP/1): foo=bar\r\n'
+                         b'ChanVariable(SIP/1): baz= 1\r\n')
+        self.assertEqual(msg.get_header('ChanVariable'),
+                         {'foo': 'bar', 'baz': '1'})
+
+    def test_output(self):
+        msg = ManagerMsg(b'Response: Success\r\nOutput: foo\r\n')
+        self.assertEqual(msg.headers, {'Response': 'Success'})
+        self.assertEqual(msg.data, 'Output: foo\r\n')
+
+
+class TestSendAction(TestCase):
+    def connect(self, replies):
+        """ connect to a server answering the first two actions with
+        replies """
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def serve():
+            conn, addr = server.accept()
+            conn.sendall(b'Asterisk Call Manager/5.0.1\r\n')
+            data = b''
+            while data.count(b'\r\n\r\n') < 2:
+                data += conn.recv(4096)
+            conn.sendall(replies)
+            while b'Logoff' not in data:
+                data += conn.recv(4096)
+            conn.sendall(b'Response: Goodbye\r\n\r\n')
+            conn.close()
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+
+        manager = Manager()
+        manager.connect('127.0.0.1', server.getsockname()[1])
+        return manager
+
+    def send_concurrently(self, manager, action_ids):
+        responses = []
+
+        def send(action_id):
+            responses.append(manager.send_action(
+                {'Action': 'Ping', 'ActionID': action_id}))
+        threads = [threading.Thread(target=send, args=(action_id,))
+                   for action_id in action_ids]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        return responses
+
+    def test_responses_by_action_id(self):
+        """ each caller gets its own response, whatever order they come in """
+        manager = self.connect(
+            b'Response: Success\r\nActionID: second\r\n\r\n'
+            b'Response: Success\r\nActionID: first\r\n\r\n')
+        responses = self.send_concurrently(manager, ('first', 'second'))
+        self.assertEqual(sorted(r['ActionID'] for r in responses),
+                         ['first', 'second'])
+        manager.close()
+
+    def test_shared_action_id(self):
+        """ callers sending the same ActionID each get a response """
+        manager = self.connect(
+            b'Response: Success\r\nActionID: x\r\nMessage: one\r\n\r\n'
+            b'Response: Success\r\nActionID: x\r\nMessage: two\r\n\r\n')
+        responses = self.send_concurrently(manager, ('x', 'x'))
+        self.assertEqual(sorted(r['Message'] for r in responses),
+                         ['one', 'two'])
+        self.assertEqual(manager._pending, {})
+        manager.close()
+
+
+class TestEventDispatch(TestCase):
+    def dispatch(self, manager, name):
+        manager._running.set()
+        manager._event_deque.append(Event(ManagerMsg(
+            ('Event: %s\r\n' % name).encode())))
+        manager._event_deque.append(None)
+        manager._event_ready.set()
+        manager.event_dispatch()
+        manager._running.clear()
+
+    def test_register_and_unregister(self):
+        manager = Manager()
+        seen = []
+
+        def on_hangup(event, manager):
+            seen.append(('hangup', event.name))
+
+        def on_all(event, manager):
+            seen.append(('all', event.name))
+        manager.register_event('Hangup', on_hangup)
+        self.dispatch(manager, 'Hangup')
+        manager.register_event('*', on_all)
+        self.dispatch(manager, 'Hangup')
+        manager.unregister_event('Hangup', on_hangup)
+        self.dispatch(manager, 'Hangup')
+        self.assertEqual(seen, [('hangup', 'Hangup'), ('hangup', 'Hangup'),
+                                ('all', 'Hangup'), ('all', 'Hangup')])